@@ -1,37 +1,193 @@
-from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
-from langchain.schema import BaseMessage, HumanMessage, SystemMessage
-from pydantic import BaseModel, Field
+import asyncio
+import hashlib
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
+if TYPE_CHECKING:
+    from semantic_cache import SemanticCache
 
-def split_summary(text: str) -> (str, str):
+# langchain_openai pulls in LangChain, openai, tiktoken and httpx, so it is
+# imported by _load_chat_model() on first agent construction rather than here
+_ChatOpenAI = None
+# One connection pool for every agent so concurrent council calls reuse
+# keep-alive connections and multiplex over HTTP/2
+_SHARED_HTTP = None
+# Transient failures worth re-issuing; APITimeoutError is an APIConnectionError
+_RETRYABLE: Tuple[type, ...] = ()
+_MAX_ATTEMPTS = 3
+# Client timeouts apply per read. A streamed reply is read chunk by chunk,
+# so a short timeout only catches a stalled stream; a non-streamed reply
+# arrives in one read after the whole generation and keeps the SDK default.
+_REQUEST_TIMEOUT = 60
+_BATCH_TIMEOUT = 600
+
+# Receives streamed response text as it arrives
+ChunkCallback = Callable[[str], Awaitable[None]]
+
+# System prompts are built once and shared by every call. Messages are plain
+# role/content dicts, which ChatOpenAI accepts directly; keeping them
+# byte-identical also lets OpenAI's prompt cache reuse the prefix
+_DRAFT_SYS = {"role": "system", "content": """You are a draft agent responsible for creating comprehensive,
+well-structured responses to user queries. Focus on clarity, accuracy, and completeness.
+Finish your reply with a single sentence summary prefixed with 'Summary:'."""}
+
+_UPDATE_SYS = {"role": "system", "content": """You are a draft agent. Your task is to improve your draft
+based on the feedback provided by the council members. Incorporate valid suggestions
+while maintaining the overall coherence of your response.
+Finish with a single sentence summary prefixed with 'Summary:'."""}
+
+_COUNCIL_SYS_TMPL = """You are {perspective}. Your role is to critically evaluate
+the draft response and provide constructive feedback. Focus on:
+- Accuracy and factual correctness
+- Completeness and coverage of the topic
+- Clarity and organization
+- Potential improvements or missing elements
+
+End with a one sentence summary prefixed with 'Summary:'."""
+
+# Used when a same-model group is sampled in one request
+_COUNCIL_GROUP_SYS = {"role": "system", "content": _COUNCIL_SYS_TMPL.format(perspective="a Council Member")}
+
+_EDITOR_SYS = {"role": "system", "content": """You are an expert editor. Your task is to take the final draft
+and ensure it is polished, coherent, and well-formatted. Make minor adjustments for:
+- Grammar and style consistency
+- Logical flow and transitions
+- Formatting and presentation
+- Overall coherence
+
+Do not make major content changes unless absolutely necessary for accuracy.
+Provide a one sentence summary of your edits prefixed with 'Summary:'."""}
+
+_JUDGE_SYS = {"role": "system", "content": """You are an impartial judge evaluating two drafts of a response. Compare the initial draft with the final draft and discuss how the final draft improved or changed. Highlight differences in clarity, accuracy and completeness. Conclude with one sentence starting with 'Summary:' summarizing your judgement."""}
+
+
+def split_summary(text: str) -> Tuple[str, str]:
     """Return main text and summary from a response."""
-    if "Summary:" in text:
-        main, summary = text.rsplit("Summary:", 1)
-        return main.strip(), summary.strip()
-    return text.strip(), ""
+    main, marker, summary = text.rpartition("Summary:")
+    if not marker:
+        return text.strip(), ""
+    return main.strip(), summary.strip()
+
+
+def _load_chat_model():
+    """Import ChatOpenAI and build the shared HTTP client once."""
+    global _ChatOpenAI, _SHARED_HTTP, _RETRYABLE
+    if _ChatOpenAI is None:
+        import httpx
+        from openai import (
+            APIConnectionError,
+            DefaultAsyncHttpxClient,
+            InternalServerError,
+            RateLimitError,
+        )
+        from langchain_openai import ChatOpenAI
+        
+        _SHARED_HTTP = DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        )
+        _RETRYABLE = (RateLimitError, APIConnectionError, InternalServerError)
+        _ChatOpenAI = ChatOpenAI
+    return _ChatOpenAI
+
+
+def _retrying() -> AsyncRetrying:
+    """Retry transient LLM failures with jittered exponential backoff."""
+    return AsyncRetrying(
+        retry=retry_if_exception_type(_RETRYABLE),
+        wait=wait_exponential_jitter(initial=2, max=30),
+        stop=stop_after_attempt(_MAX_ATTEMPTS),
+        reraise=True
+    )
 
 
-class AgentResponse(BaseModel):
+@dataclass(slots=True)
+class AgentResponse:
     content: str
     agent_id: str
     agent_type: str
-    metadata: Dict[str, Any] = Field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    @classmethod
+    def from_cache(cls, stored: Dict[str, Any]) -> "AgentResponse":
+        """Rebuild a cached response, marked as a hit with no token usage."""
+        # Fresh metadata so the stored entry is never mutated; no tokens were spent
+        metadata = {k: v for k, v in stored["metadata"].items() if k != "token_usage"}
+        metadata["cache_hit"] = True
+        return cls(stored["content"], stored["agent_id"], stored["agent_type"], metadata)
 
 
 class BaseAgent:
-    def __init__(self, agent_id: str, model_name: str, temperature: float = 0.7):
+    def __init__(self, agent_id: str, model_name: str, temperature: float = 0.7,
+                 cache: Optional["SemanticCache"] = None):
         self.agent_id = agent_id
         self.agent_type = self.__class__.__name__
-        self.llm = ChatOpenAI(
+        self.cache = cache
+        self.llm = _load_chat_model()(
             model=model_name,
-            temperature=temperature
+            temperature=temperature,
+            stream_usage=True,
+            http_async_client=_SHARED_HTTP,
+            timeout=_REQUEST_TIMEOUT,
+            # Retries are handled here so backoff is not stacked on the SDK's own
+            max_retries=0
         )
     
-    async def generate_response(self, messages: List[BaseMessage]) -> AgentResponse:
-        """Generate a response from the agent."""
-        response = await self.llm.ainvoke(messages)
-        text, summary = split_summary(response.content)
+    async def generate_response(self, messages: List[Dict[str, str]],
+                                on_chunk: Optional[ChunkCallback] = None) -> AgentResponse:
+        """Generate a response from the agent, retrying transient failures.
+        
+        If given, on_chunk receives the main text as it streams in, holding
+        back whatever follows the latest summary marker. A retried call
+        streams its text again.
+        """
+        async for attempt in _retrying():
+            with attempt:
+                # No wall-clock cap: long answers may stream for minutes, and
+                # httpx's per-read timeout already catches a stalled stream
+                response, has_summary = await self._stream(messages, on_chunk)
+        return self._build_response(response, parse_summary=has_summary)
+    
+    async def _stream(self, messages: List[Dict[str, str]],
+                      on_chunk: Optional[ChunkCallback] = None) -> Tuple[Any, bool]:
+        """Stream one completion; return the merged message and whether it has a summary."""
+        # Stream so tokens are consumed as they arrive; chunks merge their
+        # content and the usage reported on the final chunk
+        response = None
+        marker = -1  # start of the last "Summary:" seen so far
+        sent = 0  # characters already passed to on_chunk
+        async for chunk in self.llm.astream(messages):
+            response = chunk if response is None else response + chunk
+            # Only the newly arrived tail can hold a new marker (it may straddle chunks)
+            tail_start = max(len(response.content) - len(chunk.content) - 7, 0)
+            found = response.content.rfind("Summary:", tail_start)
+            if found > marker:
+                marker = found
+            if on_chunk is not None:
+                # Hold back the text after the last marker, which split_summary
+                # treats as the summary, or a possible partial marker
+                end = marker if marker >= 0 else len(response.content) - len("Summary:") + 1
+                if end > sent:
+                    await on_chunk(response.content[sent:end])
+                    sent = end
+        has_summary = marker >= 0
+        if on_chunk is not None and not has_summary and response is not None:
+            if len(response.content) > sent:
+                await on_chunk(response.content[sent:])
+        return response, has_summary
+    
+    def _build_response(self, response: Any, parse_summary: bool = True) -> AgentResponse:
+        """Convert a chat model message into an AgentResponse."""
+        if parse_summary:
+            text, summary = split_summary(response.content)
+        else:
+            text, summary = response.content.strip(), ""
         
         # Extract token usage information
         metadata = {}
@@ -52,81 +208,158 @@ class BaseAgent:
             agent_type=self.agent_type,
             metadata=metadata
         )
+    
+    async def cached_response(self, scope: str, key_text: str,
+                              messages: List[Dict[str, str]]) -> AgentResponse:
+        """Generate a response, reusing a cached one for near-duplicate prompts."""
+        if self.cache is None:
+            return await self.generate_response(messages)
+        
+        vector = await self.cache.embed(key_text)
+        hit = self.cache.lookup(scope, vector)
+        if hit is not None:
+            return AgentResponse.from_cache(hit)
+        
+        response = await self.generate_response(messages)
+        await self.cache.insert(scope, vector, asdict(response))
+        return response
 
 
 class DraftAgent(BaseAgent):
     """Agent responsible for creating initial drafts and incorporating feedback."""
     
-    def __init__(self, model_name: str, temperature: float = 0.7):
-        super().__init__("draft_agent", model_name, temperature)
+    def __init__(self, model_name: str, temperature: float = 0.7,
+                 cache: Optional["SemanticCache"] = None):
+        super().__init__("draft_agent", model_name, temperature, cache)
     
     async def create_initial_draft(self, user_query: str) -> AgentResponse:
         """Create the initial draft response to the user query."""
         messages = [
-            SystemMessage(content="""You are a draft agent responsible for creating comprehensive,
-            well-structured responses to user queries. Focus on clarity, accuracy, and completeness.
-            Finish your reply with a single sentence summary prefixed with 'Summary:'."""),
-            HumanMessage(content=user_query)
+            _DRAFT_SYS,
+            {"role": "user", "content": user_query}
         ]
-        return await self.generate_response(messages)
+        return await self.cached_response("initial_draft", user_query, messages)
     
     async def update_draft(self, current_draft: str, feedback: List[str]) -> AgentResponse:
         """Update the draft based on council feedback."""
-        feedback_text = "\n\n".join([f"Feedback {i+1}: {fb}" for i, fb in enumerate(feedback)])
+        feedback_text = "\n\n".join(f"Feedback {i}: {fb}" for i, fb in enumerate(feedback, 1))
         
         messages = [
-            SystemMessage(content="""You are a draft agent. Your task is to improve your draft
-            based on the feedback provided by the council members. Incorporate valid suggestions
-            while maintaining the overall coherence of your response.
-            Finish with a single sentence summary prefixed with 'Summary:'."""),
-            HumanMessage(content=f"""Current Draft:
+            _UPDATE_SYS,
+            {"role": "user", "content": f"""Current Draft:
 {current_draft}
 
 Council Feedback:
 {feedback_text}
 
-Please provide an updated draft that addresses the feedback while maintaining quality and coherence.""")
+Please provide an updated draft that addresses the feedback while maintaining quality and coherence."""}
         ]
         
-        response = await self.generate_response(messages)
+        response = await self.cached_response(
+            "update_draft", f"{current_draft}\n\n{feedback_text}", messages
+        )
         response.metadata["revision"] = True
         return response
 
 
+def _feedback_prompt(user_query: str, current_draft: str, round_number: int) -> Dict[str, str]:
+    """Build the council's user turn for one review round."""
+    # Round number lives in the user turn to keep the system prompt static
+    return {"role": "user", "content": f"""Review round: {round_number}
+
+User Query: {user_query}
+
+Current Draft:
+{current_draft}
+
+Please provide specific, actionable feedback to improve this response.
+Finish with a one sentence summary prefixed with 'Summary:'."""}
+
+
 class CouncilMember(BaseAgent):
     """Council member agent that provides feedback on drafts."""
     
     def __init__(self, member_id: int, model_name: str, temperature: float = 0.7, 
-                 perspective: Optional[str] = None):
-        super().__init__(f"council_member_{member_id}", model_name, temperature)
+                 perspective: Optional[str] = None, cache: Optional["SemanticCache"] = None):
+        super().__init__(f"council_member_{member_id}", model_name, temperature, cache)
         self.member_id = member_id
         self.perspective = perspective or f"Critical Reviewer {member_id}"
+        self._system_message = {
+            "role": "system",
+            "content": _COUNCIL_SYS_TMPL.format(perspective=self.perspective)
+        }
+        self._batch_llm = None
+    
+    def _batch_model(self) -> Any:
+        """Return a non-streaming chat model for fused requests, built on first use."""
+        if self._batch_llm is None:
+            self._batch_llm = _load_chat_model()(
+                model=self.llm.model_name,
+                temperature=self.llm.temperature,
+                http_async_client=_SHARED_HTTP,
+                timeout=_BATCH_TIMEOUT,
+                max_retries=0
+            )
+        return self._batch_llm
     
     async def provide_feedback(self, user_query: str, current_draft: str, 
                               round_number: int) -> AgentResponse:
         """Provide feedback on the current draft."""
-        messages = [
-            SystemMessage(content=f"""You are {self.perspective}. Your role is to critically evaluate
-            the draft response and provide constructive feedback. Focus on:
-            - Accuracy and factual correctness
-            - Completeness and coverage of the topic
-            - Clarity and organization
-            - Potential improvements or missing elements
-
-            This is round {round_number} of the review process.
-            End with a one sentence summary prefixed with 'Summary:'."""),
-            HumanMessage(content=f"""User Query: {user_query}
-
-Current Draft:
-{current_draft}
-
-Please provide specific, actionable feedback to improve this response.
-Finish with a one sentence summary prefixed with 'Summary:'.""")
-        ]
+        messages = self._feedback_messages(user_query, current_draft, round_number)
         
-        response = await self.generate_response(messages)
+        # Same query and a near-identical draft should get the same critique
+        query_hash = hashlib.sha1(user_query.encode()).hexdigest()
+        response = await self.cached_response(
+            f"{self.agent_id}:{query_hash}", current_draft, messages
+        )
         response.metadata["round"] = round_number
         return response
+    
+    @staticmethod
+    async def provide_feedback_batch(members: List["CouncilMember"], user_query: str,
+                                     current_draft: str, round_number: int) -> List[Any]:
+        """Collect feedback from members that share a model and temperature.
+        
+        The draft is sent once and the API samples one completion per member
+        (n=len(members)), so the group's prompt tokens are billed once. If the
+        request fails, its exception stands in for every member's response.
+        """
+        if members[0].cache is not None or len(members) == 1:
+            # Cache lookups are per member, and a lone member has nothing to fuse
+            return await asyncio.gather(
+                *(m.provide_feedback(user_query, current_draft, round_number) for m in members),
+                return_exceptions=True
+            )
+        
+        from langchain_core.messages import convert_to_messages
+        messages = convert_to_messages([
+            _COUNCIL_GROUP_SYS,
+            _feedback_prompt(user_query, current_draft, round_number)
+        ])
+        try:
+            async for attempt in _retrying():
+                with attempt:
+                    result = await members[0]._batch_model().agenerate(
+                        [messages], n=len(members)
+                    )
+        except Exception as e:
+            return [e] * len(members)
+        
+        results = []
+        for i, (member, generation) in enumerate(zip(members, result.generations[0])):
+            message = generation.message
+            if i:
+                # Every choice reports the whole request's usage; count it once
+                message = message.model_copy(update={"usage_metadata": None})
+            response = member._build_response(message)
+            response.metadata["round"] = round_number
+            results.append(response)
+        return results
+    
+    def _feedback_messages(self, user_query: str, current_draft: str,
+                           round_number: int) -> List[Dict[str, str]]:
+        """Build the review prompt for one round."""
+        return [self._system_message, _feedback_prompt(user_query, current_draft, round_number)]
 
 
 class EditorAgent(BaseAgent):
@@ -136,27 +369,20 @@ class EditorAgent(BaseAgent):
         super().__init__("editor_agent", model_name, temperature)
     
     async def edit_final_response(self, user_query: str, final_draft: str, 
-                                 debate_history: List[Dict[str, Any]]) -> AgentResponse:
-        """Create the final, polished response."""
+                                 debate_history: List[List[Any]],
+                                 on_chunk: Optional[ChunkCallback] = None) -> AgentResponse:
+        """Create the final, polished response, optionally streaming its text."""
         messages = [
-            SystemMessage(content="""You are an expert editor. Your task is to take the final draft
-            and ensure it is polished, coherent, and well-formatted. Make minor adjustments for:
-            - Grammar and style consistency
-            - Logical flow and transitions
-            - Formatting and presentation
-            - Overall coherence
-
-            Do not make major content changes unless absolutely necessary for accuracy.
-            Provide a one sentence summary of your edits prefixed with 'Summary:'."""),
-            HumanMessage(content=f"""User Query: {user_query}
+            _EDITOR_SYS,
+            {"role": "user", "content": f"""User Query: {user_query}
 
 Final Draft:
 {final_draft}
 
-Please provide the polished, final version of this response.""")
+Please provide the polished, final version of this response."""}
         ]
         
-        response = await self.generate_response(messages)
+        response = await self.generate_response(messages, on_chunk=on_chunk)
         response.metadata["final"] = True
         return response
 
@@ -171,8 +397,8 @@ class JudgeAgent(BaseAgent):
                              final_draft: str) -> AgentResponse:
         """Provide commentary on how the drafts compare."""
         messages = [
-            SystemMessage(content="""You are an impartial judge evaluating two drafts of a response. Compare the initial draft with the final draft and discuss how the final draft improved or changed. Highlight differences in clarity, accuracy and completeness. Conclude with one sentence starting with 'Summary:' summarizing your judgement."""),
-            HumanMessage(content=f"""User Query: {user_query}
+            _JUDGE_SYS,
+            {"role": "user", "content": f"""User Query: {user_query}
 
 Initial Draft:
 {initial_draft}
@@ -180,7 +406,7 @@ Initial Draft:
 Final Draft:
 {final_draft}
 
-Provide your comparison and commentary.""")
+Provide your comparison and commentary."""}
         ]
 
         response = await self.generate_response(messages)
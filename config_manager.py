@@ -1,22 +1,59 @@
-import json
 import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import List, Mapping, Optional, Tuple
 from pydantic import BaseModel, Field
 
 
+# Read-only and shared; callers needing a mutable copy should use dict(...)
+_AVAILABLE_MODELS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "draft_agent": (
+        "gpt-4o",
+        "gpt-4o-mini",
+        "gpt-4-turbo",
+        "gpt-3.5-turbo"
+    ),
+    "council_member": (
+        "gpt-4o",
+        "gpt-4o-mini",
+        "gpt-4-turbo",
+        "gpt-3.5-turbo"
+    ),
+    "editor_agent": (
+        "gpt-4o",
+        "gpt-4o-mini",
+        "gpt-4-turbo"
+    ),
+    "judge_agent": (
+        "gpt-4o",
+        "gpt-4o-mini",
+        "gpt-4-turbo"
+    )
+})
+
+
 class AgentConfig(BaseModel):
     model: str = Field(description="Model to use for this agent")
     temperature: float = Field(default=0.7, description="Temperature for model responses")
 
 
-class CouncilConfig(BaseModel):
-    openai_api_key: str = Field(description="OpenAI API key")
+class CouncilSettings(BaseModel):
+    """Council settings shared by the stored config and the runtime config."""
     draft_agent: AgentConfig = Field(description="Configuration for the draft agent")
     council_members: List[AgentConfig] = Field(description="Configuration for council members")
     editor_agent: AgentConfig = Field(description="Configuration for the editor agent")
     judge_agent: AgentConfig = Field(description="Configuration for the judge agent")
     debate_rounds: int = Field(default=3, ge=1, description="Number of debate rounds")
+    semantic_cache: bool = Field(default=False, description="Reuse responses for near-duplicate prompts")
+    max_concurrency: int = Field(default=8, ge=1, description="Maximum council requests in flight at once")
+    early_stop_threshold: float = Field(
+        default=0.0, ge=0.0, le=1.0,
+        description="End the debate once consecutive rounds' feedback is this similar (0 = identical only)"
+    )
+
+
+class CouncilConfig(CouncilSettings):
+    openai_api_key: str = Field(description="OpenAI API key")
 
 
 class ConfigManager:
@@ -28,9 +65,8 @@ class ConfigManager:
         """Load configuration from file if it exists."""
         if self.config_path.exists():
             try:
-                with open(self.config_path, 'r') as f:
-                    data = json.load(f)
-                self.config = CouncilConfig(**data)
+                # pydantic-core parses the bytes directly, no intermediate dict
+                self.config = CouncilConfig.model_validate_json(self.config_path.read_bytes())
                 return self.config
             except Exception as e:
                 print(f"Error loading config: {e}")
@@ -39,8 +75,8 @@ class ConfigManager:
     
     def save_config(self, config: CouncilConfig) -> None:
         """Save configuration to file."""
-        with open(self.config_path, 'w') as f:
-            json.dump(config.model_dump(), f, indent=2)
+        # Pydantic serializes straight to JSON without an intermediate dict
+        self.config_path.write_bytes(config.model_dump_json(indent=2).encode())
         self.config = config
     
     def config_exists(self) -> bool:
@@ -48,29 +84,6 @@ class ConfigManager:
         return self.config_path.exists()
     
     @staticmethod
-    def get_available_models() -> Dict[str, List[str]]:
+    def get_available_models() -> Mapping[str, Tuple[str, ...]]:
         """Return available models for each agent type."""
-        return {
-            "draft_agent": [
-                "gpt-4o",
-                "gpt-4o-mini",
-                "gpt-4-turbo",
-                "gpt-3.5-turbo"
-            ],
-            "council_member": [
-                "gpt-4o",
-                "gpt-4o-mini",
-                "gpt-4-turbo",
-                "gpt-3.5-turbo"
-            ],
-            "editor_agent": [
-                "gpt-4o",
-                "gpt-4o-mini",
-                "gpt-4-turbo"
-            ],
-            "judge_agent": [
-                "gpt-4o",
-                "gpt-4o-mini",
-                "gpt-4-turbo"
-            ]
-        }
+        return _AVAILABLE_MODELS
@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 """Echo Chamber - Simple CLI Version."""
 
-import asyncio
+import argparse
 import sys
-from simple_cli import main
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Echo Chamber - AI Council CLI")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always call the API instead of reusing cached responses")
+    args = parser.parse_args()
+    
+    # Imported after parsing so --help returns without loading the CLI
+    from simple_cli import run_cli
+    
     try:
-        asyncio.run(main())
+        run_cli(use_cache=not args.no_cache)
     except KeyboardInterrupt:
         print("\n👋 Goodbye!")
         sys.exit(0)
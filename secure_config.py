@@ -1,26 +1,17 @@
 #!/usr/bin/env python3
 """Secure configuration management that doesn't store API keys in files."""
 
-import json
+import asyncio
 import os
 from pathlib import Path
-from typing import Dict, List, Optional
-from pydantic import BaseModel, Field
+from typing import Mapping, Optional, Tuple
+import orjson
 from dotenv import load_dotenv
+from config_manager import ConfigManager, CouncilSettings
 
 
-class AgentConfig(BaseModel):
-    model: str = Field(description="Model to use for this agent")
-    temperature: float = Field(default=0.7, description="Temperature for model responses")
-
-
-class CouncilConfigSecure(BaseModel):
+class CouncilConfigSecure(CouncilSettings):
     """Configuration without API key - keys come from environment."""
-    draft_agent: AgentConfig = Field(description="Configuration for the draft agent")
-    council_members: List[AgentConfig] = Field(description="Configuration for council members")
-    editor_agent: AgentConfig = Field(description="Configuration for the editor agent")
-    judge_agent: AgentConfig = Field(description="Configuration for the judge agent")
-    debate_rounds: int = Field(default=3, ge=1, description="Number of debate rounds")
 
 
 class SecureConfigManager:
@@ -29,31 +20,46 @@ class SecureConfigManager:
     def __init__(self, config_path: str = "council_config.json"):
         self.config_path = Path(config_path)
         self.config: Optional[CouncilConfigSecure] = None
+        self._config_mtime_ns: Optional[int] = None
         # Load environment variables from .env file if it exists
         load_dotenv()
+        # The key does not change for the life of the process once .env is loaded
+        self._api_key = os.getenv("OPENAI_API_KEY")
         
     def get_api_key(self) -> Optional[str]:
         """Get API key from environment variables."""
-        return os.getenv("OPENAI_API_KEY")
+        return self._api_key
     
     def load_config(self) -> Optional[CouncilConfigSecure]:
         """Load configuration from file (without API key)."""
-        if self.config_path.exists():
-            try:
-                with open(self.config_path, 'r') as f:
-                    data = json.load(f)
-                self.config = CouncilConfigSecure(**data)
-                return self.config
-            except Exception as e:
-                print(f"Error loading config: {e}")
-                return None
-        return None
+        try:
+            mtime_ns = self.config_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        
+        # Skip the parse and validation when the file has not changed
+        if self.config is not None and mtime_ns == self._config_mtime_ns:
+            return self.config
+        
+        try:
+            # pydantic-core parses the bytes directly, no intermediate dict
+            self.config = CouncilConfigSecure.model_validate_json(self.config_path.read_bytes())
+            self._config_mtime_ns = mtime_ns
+            return self.config
+        except Exception as e:
+            print(f"Error loading config: {e}")
+            return None
     
     def save_config(self, config: CouncilConfigSecure) -> None:
         """Save configuration to file (without API key)."""
-        with open(self.config_path, 'w') as f:
-            json.dump(config.model_dump(), f, indent=2)
+        # Pydantic serializes straight to JSON without an intermediate dict
+        self.config_path.write_bytes(config.model_dump_json(indent=2).encode())
         self.config = config
+        self._config_mtime_ns = self.config_path.stat().st_mtime_ns
+    
+    async def asave_config(self, config: CouncilConfigSecure) -> None:
+        """Save configuration without blocking the event loop on file I/O."""
+        await asyncio.to_thread(self.save_config, config)
     
     def config_exists(self) -> bool:
         """Check if configuration file exists."""
@@ -76,33 +82,14 @@ class SecureConfigManager:
         full_config["openai_api_key"] = api_key
         return full_config
     
+    async def aget_full_config(self) -> Optional[dict]:
+        """Get full configuration without blocking the event loop on file I/O."""
+        return await asyncio.to_thread(self.get_full_config)
+    
     @staticmethod
-    def get_available_models() -> Dict[str, List[str]]:
+    def get_available_models() -> Mapping[str, Tuple[str, ...]]:
         """Return available models for each agent type."""
-        return {
-            "draft_agent": [
-                "gpt-4o",
-                "gpt-4o-mini",
-                "gpt-4-turbo",
-                "gpt-3.5-turbo"
-            ],
-            "council_member": [
-                "gpt-4o",
-                "gpt-4o-mini",
-                "gpt-4-turbo",
-                "gpt-3.5-turbo"
-            ],
-            "editor_agent": [
-                "gpt-4o",
-                "gpt-4o-mini",
-                "gpt-4-turbo"
-            ],
-            "judge_agent": [
-                "gpt-4o",
-                "gpt-4o-mini",
-                "gpt-4-turbo"
-            ]
-        }
+        return ConfigManager.get_available_models()
     
     @staticmethod
     def setup_env_example():
@@ -134,8 +121,7 @@ def migrate_old_config():
         print("🔄 Migrating from old config format...")
         
         try:
-            with open(old_config_path, 'r') as f:
-                old_data = json.load(f)
+            old_data = orjson.loads(old_config_path.read_bytes())
             
             # Extract API key
             api_key = old_data.pop("openai_api_key", None)
@@ -0,0 +1,142 @@
+"""Embedding-similarity cache for agent responses."""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+
+
+class SemanticCache:
+    """Return stored responses for prompts that embed close to a previous one.
+
+    Entries are grouped by scope so that, for example, a council member's
+    feedback can never be served as a draft.
+
+    On disk the cache is an append-only pair of files: ``<path>.f32`` holds
+    the unit-length embeddings as contiguous float32 rows and is memory
+    mapped on load, and ``<path>.jsonl`` holds the matching scope and
+    response for each row.
+    """
+
+    def __init__(self, path: str = "cache", threshold: float = 0.92,
+                 model_name: str = "text-embedding-3-small"):
+        self.vectors_path = Path(path).with_suffix(".f32")
+        self.entries_path = Path(path).with_suffix(".jsonl")
+        self.threshold = threshold
+        # Imported here so the CLI only loads langchain_openai when caching is on
+        from langchain_openai import OpenAIEmbeddings
+        self.embeddings = OpenAIEmbeddings(model=model_name)
+        self.scopes: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+        self.vectors: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+        self.load()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed text as a unit vector so a dot product is the cosine similarity."""
+        vector = np.asarray(await self.embeddings.aembed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, scope: str, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return the closest stored payload in scope if it clears the threshold."""
+        if self.vectors is None:
+            return None
+        rows = [i for i, s in enumerate(self.scopes) if s == scope]
+        if not rows:
+            return None
+        similarities = self.vectors[rows] @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self.payloads[rows[best]]
+
+    async def insert(self, scope: str, vector: np.ndarray, payload: Dict[str, Any]) -> None:
+        """Append a payload to the on-disk log and remap the embeddings.
+
+        The fsynced writes run in a worker thread; the lock keeps concurrent
+        inserts from interleaving rows.
+        """
+        vector = vector.astype(np.float32, copy=False)
+        line = orjson.dumps({"scope": scope, "dim": len(vector), "response": payload}) + b"\n"
+        async with self._lock:
+            vectors = await asyncio.to_thread(self._write, len(self.payloads), vector, line)
+            # Memory is updated on the loop so lookups never see a partial insert
+            self.scopes.append(scope)
+            self.payloads.append(payload)
+            self.vectors = vectors
+
+    def _write(self, rows: int, vector: np.ndarray, line: bytes) -> np.ndarray:
+        """Append one vector row and its entry line, then map all rows."""
+        row_start = rows * 4 * len(vector)
+        entries_start = self.entries_path.stat().st_size if self.entries_path.exists() else 0
+        # Vector row first: a crash before the entry line leaves an orphan row
+        # that load() trims, never an entry without its vector
+        try:
+            self._append(self.vectors_path, vector.tobytes())
+            self._append(self.entries_path, line)
+        except Exception:
+            # Undo a half-written pair so later rows stay aligned with their entries
+            for path, size in ((self.vectors_path, row_start), (self.entries_path, entries_start)):
+                if path.exists() and path.stat().st_size > size:
+                    os.truncate(path, size)
+            raise
+        return self._map(rows + 1, len(vector))
+
+    def load(self) -> None:
+        """Map cached entries from disk, trimming both files back to complete pairs.
+
+        A crash mid-insert can leave a vector row without its entry line, or
+        a torn last line. Both files are cut back to the longest prefix where
+        every row has an intact entry, so row i always belongs to entry i.
+        """
+        try:
+            entries: List[Dict[str, Any]] = []
+            entries_end = [0]  # byte offset just past each intact line
+            if self.entries_path.exists():
+                with open(self.entries_path, 'rb') as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        try:
+                            entry = orjson.loads(line)
+                        except orjson.JSONDecodeError:
+                            break
+                        if entries and entry["dim"] != entries[0]["dim"]:
+                            break
+                        entries.append(entry)
+                        entries_end.append(entries_end[-1] + len(line))
+
+            row_bytes = 4 * entries[0]["dim"] if entries else 0
+            vector_bytes = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+            rows = min(len(entries), vector_bytes // row_bytes) if entries else 0
+
+            # Drop orphan rows and lines so the next append stays aligned
+            if self.vectors_path.exists() and vector_bytes != rows * row_bytes:
+                os.truncate(self.vectors_path, rows * row_bytes)
+            if self.entries_path.exists() and self.entries_path.stat().st_size != entries_end[rows]:
+                os.truncate(self.entries_path, entries_end[rows])
+
+            self.scopes = [e["scope"] for e in entries[:rows]]
+            self.payloads = [e["response"] for e in entries[:rows]]
+            self.vectors = self._map(rows, entries[0]["dim"]) if rows else None
+        except Exception as e:
+            print(f"Error loading cache: {e}")
+            # Start over rather than keep rows that no longer match memory
+            self.vectors, self.scopes, self.payloads = None, [], []
+            for path in (self.vectors_path, self.entries_path):
+                path.unlink(missing_ok=True)
+
+    def _map(self, rows: int, dim: int) -> np.ndarray:
+        """Memory-map the first ``rows`` embeddings."""
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, dim))
+
+    @staticmethod
+    def _append(path: Path, data: bytes) -> None:
+        """Append bytes to a file and flush them to disk."""
+        with open(path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
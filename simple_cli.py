@@ -4,40 +4,48 @@
 import asyncio
 import os
 import sys
-from typing import Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
 import getpass
+try:
+    import uvloop
+except ImportError:  # uvloop does not support Windows
+    uvloop = None
 from rich.console import Console
-from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
-from rich.markdown import Markdown
+from rich.markup import escape
 from rich.prompt import Prompt, Confirm
-from rich.table import Table
 
 from config_manager import CouncilConfig, AgentConfig
 from secure_config import SecureConfigManager, CouncilConfigSecure, migrate_old_config
-from workflow import CouncilWorkflow
 
-
-def split_summary(text: str) -> (str, str):
-    """Return main text and summary from a response."""
-    if "Summary:" in text:
-        main, summary = text.rsplit("Summary:", 1)
-        return main.strip(), summary.strip()
-    return text.strip(), ""
+# Rendering helpers and the workflow (LangGraph, LangChain) are imported where
+# they are first used so startup only pays for the prompt
+if TYPE_CHECKING:
+    from rich.console import Group
+    from rich.live import Live
+    from workflow import CouncilWorkflow
 
 
 class SimpleCouncilCLI:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
         self.console = Console()
+        self.use_cache = use_cache
         self.config_manager = SecureConfigManager()
-        self.workflow: Optional[CouncilWorkflow] = None
+        self.workflow: Optional["CouncilWorkflow"] = None
         self.config: Optional[CouncilConfig] = None
         self.progress = None
         self.progress_task = None
         self.total_tokens = 0
+        self.feedback_round_shown: Optional[int] = None
+        self.live: Optional["Live"] = None
+        self.final_chunks: List[str] = []
+        self.preview: Optional["Group"] = None
+        self.preview_chunks = 0
+        self.final_view: Optional["Group"] = None
     
     def print_banner(self):
         """Print the application banner."""
+        from rich.panel import Panel
         banner = Panel.fit(
             "🤖 [bold cyan]Echo Chamber[/bold cyan]\n"
             "Multi-agent collaborative AI system",
@@ -53,7 +61,7 @@ class SimpleCouncilCLI:
         
         # Check if we have a complete setup
         if self.config_manager.has_valid_setup():
-            full_config_data = self.config_manager.get_full_config()
+            full_config_data = await self.config_manager.aget_full_config()
             if full_config_data:
                 # Set environment variable
                 os.environ["OPENAI_API_KEY"] = full_config_data["openai_api_key"]
@@ -89,10 +97,8 @@ class SimpleCouncilCLI:
                 return False
             
             # Save to .env file
-            from pathlib import Path
             env_path = Path(".env")
-            with open(env_path, 'w') as f:
-                f.write(f"OPENAI_API_KEY={api_key}\n")
+            await asyncio.to_thread(env_path.write_text, f"OPENAI_API_KEY={api_key}\n")
             self.console.print("💾 [green]API key saved to .env file[/green]")
         
         os.environ["OPENAI_API_KEY"] = api_key
@@ -143,24 +149,29 @@ class SimpleCouncilCLI:
         debate_rounds = Prompt.ask("Number of debate rounds", choices=["1", "2", "3", "4", "5"], default="3")
         debate_rounds = int(debate_rounds)
         
+        # Agent configs are built once and shared by both config objects
+        draft_config = AgentConfig(model=draft_model)
+        editor_config = AgentConfig(model=editor_model)
+        judge_config = AgentConfig(model=judge_model)
+        
         # Create and save secure configuration (without API key)
         secure_config = CouncilConfigSecure(
-            draft_agent=AgentConfig(model=draft_model),
+            draft_agent=draft_config,
             council_members=council_members,
-            editor_agent=AgentConfig(model=editor_model),
-            judge_agent=AgentConfig(model=judge_model),
+            editor_agent=editor_config,
+            judge_agent=judge_config,
             debate_rounds=debate_rounds
         )
         
-        self.config_manager.save_config(secure_config)
+        await self.config_manager.asave_config(secure_config)
         
         # Create full config for workflow (with API key)
         self.config = CouncilConfig(
             openai_api_key=api_key,
-            draft_agent=AgentConfig(model=draft_model),
+            draft_agent=draft_config,
             council_members=council_members,
-            editor_agent=AgentConfig(model=editor_model),
-            judge_agent=AgentConfig(model=judge_model),
+            editor_agent=editor_config,
+            judge_agent=judge_config,
             debate_rounds=debate_rounds
         )
         
@@ -172,6 +183,7 @@ class SimpleCouncilCLI:
         if not self.config:
             return
         
+        from rich.table import Table
         table = Table(title="Council Configuration")
         table.add_column("Component", style="cyan")
         table.add_column("Model", style="green")
@@ -190,12 +202,17 @@ class SimpleCouncilCLI:
     
     async def process_query(self, query: str):
         """Process a query through the council workflow."""
+        from rich.progress import Progress, SpinnerColumn, TextColumn
         if not self.workflow:
-            self.workflow = CouncilWorkflow(self.config, ui_callback=self.handle_workflow_event)
+            from workflow import CouncilWorkflow
+            self.workflow = CouncilWorkflow(
+                self.config, ui_callback=self.handle_workflow_event, use_cache=self.use_cache
+            )
         
         self.console.print(f"\n🔍 [cyan]Query:[/cyan] {query}")
         self.console.print()
         self.total_tokens = 0  # Reset token counter
+        self.feedback_round_shown = None
         
         with Progress(
             SpinnerColumn(),
@@ -212,113 +229,147 @@ class SimpleCouncilCLI:
                 judge_commentary = result.get("judge_commentary", "")
 
                 progress.update(task, description="Complete!")
-                progress.stop()
                 
-                # Show final response
-                self.console.print("\n" + "="*80)
-                self.console.print("🎉 [bold green]Final Response[/bold green]")
-                self.console.print("="*80)
-                self.console.print()
-                self.console.print(Markdown(final_response))
+                # Show final response; when it was streamed, replace the live
+                # preview with the finished text. Markdown parsing and
+                # rendering run in a worker thread to keep the loop free.
+                final_view = await asyncio.to_thread(self.final_response_view, final_response)
+                if self.live:
+                    # stop() does the last, full-height render of the finished text
+                    self.final_view = final_view
+                    await asyncio.to_thread(self.live.stop)
+                else:
+                    progress.stop()
+                    await asyncio.to_thread(self.console.print, final_view)
                 if judge_commentary:
-                    self.console.print()
-                    self.console.print("🧑‍⚖️ [magenta]Judge Commentary[/magenta]")
-                    self.console.print(Markdown(judge_commentary))
+                    await asyncio.to_thread(self.print_judge_commentary, judge_commentary)
                 self.console.print()
                 
-                # Save response
-                with open("council_response.txt", "w") as f:
-                    f.write(f"Query: {query}\n\n")
-                    f.write(f"Final Response:\n{final_response}\n\n")
-                    if judge_commentary:
-                        f.write(f"Judge Commentary:\n{judge_commentary}\n")
+                # Save response without blocking the event loop on disk I/O
+                saved = f"Query: {query}\n\nFinal Response:\n{final_response}\n\n"
+                if judge_commentary:
+                    saved += f"Judge Commentary:\n{judge_commentary}\n"
+                await asyncio.to_thread(Path("council_response.txt").write_text, saved)
                 
                 self.console.print("💾 [dim]Response saved to council_response.txt[/dim]")
                 self.console.print(f"📊 [bold cyan]Total tokens used: {self.total_tokens}[/bold cyan]")
                 
             except Exception as e:
                 progress.stop()
+                if self.live:
+                    self.live.stop()
                 self.console.print(f"\n❌ [red]Error: {str(e)}[/red]")
             finally:
                 self.progress = None
                 self.progress_task = None
+                self.live = None
+                self.final_chunks = []
+                self.preview = None
+                self.preview_chunks = 0
+                self.final_view = None
+    
+    def final_response_view(self, text: str) -> "Group":
+        """Build the final response section."""
+        from rich.console import Group
+        from rich.markdown import Markdown
+        return Group(
+            "\n" + "="*80,
+            "🎉 [bold green]Final Response[/bold green]",
+            "="*80,
+            "",
+            Markdown(text)
+        )
+    
+    def live_view(self) -> "Group":
+        """Return the live display, re-parsing the Markdown only when new text arrived."""
+        if self.final_view is not None:
+            return self.final_view
+        count = len(self.final_chunks)
+        if self.preview is None or count != self.preview_chunks:
+            self.preview = self.final_response_view("".join(self.final_chunks[:count]))
+            self.preview_chunks = count
+        return self.preview
+    
+    def print_judge_commentary(self, commentary: str) -> None:
+        """Print the judge's commentary."""
+        from rich.markdown import Markdown
+        self.console.print()
+        self.console.print("🧑‍⚖️ [magenta]Judge Commentary[/magenta]")
+        self.console.print(Markdown(commentary))
     
     async def handle_workflow_event(self, event_type: str, data):
         """Handle workflow events for progress updates."""
         if event_type == "status":
             if self.progress and self.progress_task is not None:
                 self.progress.update(self.progress_task, description=str(data))
+        elif event_type == "final_chunk":
+            self.final_chunks.append(data)
+            if not self.live:
+                # Only one live display can run, so the spinner gives way
+                if self.progress:
+                    self.progress.stop()
+                from rich.live import Live
+                # The view is built by Live's own refresh thread, only when a
+                # refresh is due; text taller than the terminal is cropped
+                # until stop() prints it in full
+                self.live = Live(console=self.console, get_renderable=self.live_view)
+                self.live.start()
         elif event_type == "draft_created":
             summary = data.metadata.get("summary", "")
-            token_usage = data.metadata.get("token_usage", {})
-            
-            if summary:
-                self.console.print(f"✅ [green]Draft Created:[/green] {summary}")
-            else:
-                self.console.print("✅ [green]Initial draft created[/green]")
-            
-            if token_usage:
-                tokens = token_usage.get('total_tokens', 0)
-                self.total_tokens += tokens
-                self.console.print(f"   📊 [dim]{token_usage.get('input_tokens', 0)} in → {token_usage.get('output_tokens', 0)} out[/dim]")
-            self.console.print("─" * 50)
-            self.console.print()
+            lines = [f"✅ [green]Draft Created:[/green] {summary}" if summary
+                     else "✅ [green]Initial draft created[/green]"]
+            self.add_usage_line(lines, data.metadata.get("token_usage"), "   ")
+            lines += ["─" * 50, ""]
+            # One print per event keeps terminal writes to one per update
+            self.console.print("\n".join(lines))
+        elif event_type == "feedback_item":
+            lines = []
+            if self.feedback_round_shown != data['round']:
+                self.feedback_round_shown = data['round']
+                lines.append(f"💬 [blue]Debate round {data['round']} summaries:[/blue]")
+            fb = data['feedback']
+            if fb.summary:
+                lines.append(f"  • {fb.agent_id}: {fb.summary}")
+            self.add_usage_line(lines, fb.token_usage, "    ")
+            if lines:
+                self.console.print("\n".join(lines))
+        elif event_type == "feedback_error":
+            lines = []
+            if self.feedback_round_shown != data['round']:
+                self.feedback_round_shown = data['round']
+                lines.append(f"💬 [blue]Debate round {data['round']} summaries:[/blue]")
+            lines.append(f"  ⚠️ [red]{data['agent_id']} failed:[/red] {escape(data['error'])}")
+            self.console.print("\n".join(lines))
         elif event_type == "feedback_round":
-            self.console.print(f"💬 [blue]Debate round {data['round']} summaries:[/blue]")
-            for fb in data['feedback']:
-                summary = fb.get('summary', '')
-                token_usage = fb.get('token_usage', {})
-                if summary:
-                    self.console.print(f"  • {fb['agent_id']}: {summary}")
-                if token_usage:
-                    tokens = token_usage.get('total_tokens', 0)
-                    self.total_tokens += tokens
-                    self.console.print(f"    📊 [dim]{token_usage.get('input_tokens', 0)} in → {token_usage.get('output_tokens', 0)} out[/dim]")
-            self.console.print("─" * 50)
-            self.console.print()
+            # Individual items were already shown as they arrived
+            self.console.print("─" * 50 + "\n")
         elif event_type == "draft_updated":
             summary = data.metadata.get("summary", "")
-            token_usage = data.metadata.get("token_usage", {})
-            
-            if summary:
-                self.console.print(f"✏️ [yellow]Draft Updated:[/yellow] {summary}")
-            else:
-                self.console.print("✏️ [yellow]Draft updated based on feedback[/yellow]")
-            
-            if token_usage:
-                tokens = token_usage.get('total_tokens', 0)
-                self.total_tokens += tokens
-                self.console.print(f"   📊 [dim]{token_usage.get('input_tokens', 0)} in → {token_usage.get('output_tokens', 0)} out[/dim]")
-            self.console.print("─" * 50)
-            self.console.print()
+            lines = [f"✏️ [yellow]Draft Updated:[/yellow] {summary}" if summary
+                     else "✏️ [yellow]Draft updated based on feedback[/yellow]"]
+            self.add_usage_line(lines, data.metadata.get("token_usage"), "   ")
+            lines += ["─" * 50, ""]
+            self.console.print("\n".join(lines))
         elif event_type == "final_response":
             summary = data.metadata.get("summary", "")
-            token_usage = data.metadata.get("token_usage", {})
-            
-            if summary:
-                self.console.print(f"🎯 [green]Final Summary:[/green] {summary}")
-            else:
-                self.console.print("🎯 [green]Final response ready[/green]")
-            
-            if token_usage:
-                tokens = token_usage.get('total_tokens', 0)
-                self.total_tokens += tokens
-                self.console.print(f"   📊 [dim]{token_usage.get('input_tokens', 0)} in → {token_usage.get('output_tokens', 0)} out[/dim]")
-            self.console.print("─" * 50)
-            self.console.print()
+            lines = [f"🎯 [green]Final Summary:[/green] {summary}" if summary
+                     else "🎯 [green]Final response ready[/green]"]
+            self.add_usage_line(lines, data.metadata.get("token_usage"), "   ")
+            lines += ["─" * 50, ""]
+            self.console.print("\n".join(lines))
         elif event_type == "judge_commentary":
             summary = data.metadata.get("summary", "")
-            token_usage = data.metadata.get("token_usage", {})
-            
-            if summary:
-                self.console.print(f"🧑‍⚖️ [magenta]Judge Summary:[/magenta] {summary}")
-            
-            if token_usage:
-                tokens = token_usage.get('total_tokens', 0)
-                self.total_tokens += tokens
-                self.console.print(f"   📊 [dim]{token_usage.get('input_tokens', 0)} in → {token_usage.get('output_tokens', 0)} out[/dim]")
-            self.console.print("─" * 50)
-            self.console.print()
+            lines = [f"🧑‍⚖️ [magenta]Judge Summary:[/magenta] {summary}"] if summary else []
+            self.add_usage_line(lines, data.metadata.get("token_usage"), "   ")
+            lines += ["─" * 50, ""]
+            self.console.print("\n".join(lines))
+    
+    def add_usage_line(self, lines: List[str], token_usage: Optional[dict], indent: str) -> None:
+        """Count a response's tokens and append its usage line."""
+        if not token_usage:
+            return
+        self.total_tokens += token_usage.get('total_tokens', 0)
+        lines.append(f"{indent}📊 [dim]{token_usage.get('input_tokens', 0)} in → {token_usage.get('output_tokens', 0)} out[/dim]")
     
     def show_example_prompts(self):
         """Show example prompts users can try."""
@@ -373,11 +424,18 @@ class SimpleCouncilCLI:
                 self.console.print(f"\n❌ [red]Unexpected error: {str(e)}[/red]")
 
 
-async def main():
+async def main(use_cache: bool = True):
     """Main entry point."""
-    cli = SimpleCouncilCLI()
+    cli = SimpleCouncilCLI(use_cache=use_cache)
     await cli.run()
 
 
+def run_cli(use_cache: bool = True):
+    """Run the CLI on uvloop's event loop when available, else asyncio's default."""
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main(use_cache=use_cache))
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_cli()
@@ -1,33 +1,123 @@
-from typing import Dict, List, Any, TypedDict, Annotated, Literal
-from langgraph.graph import StateGraph, END, START
-from langgraph.graph.message import add_messages
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Any, NamedTuple, Optional, Set, Annotated, Literal
+from langchain_core.runnables import RunnableConfig
 from agents import DraftAgent, CouncilMember, EditorAgent, JudgeAgent, AgentResponse
 from config_manager import CouncilConfig
 import asyncio
-import operator
+import hashlib
+import orjson
 
+if TYPE_CHECKING:
+    from langgraph.graph.state import CompiledStateGraph
 
-class CouncilState(TypedDict):
-    user_query: str
-    current_draft: str
-    drafts: Annotated[List[str], operator.add]
-    feedback_history: Annotated[List[List[Dict[str, str]]], operator.add]
-    current_round: int
-    max_rounds: int
-    final_response: str
-    ui_callback: Any
-    judge_commentary: str
+
+_STATUS_DRAFT = "Creating initial draft..."
+_STATUS_UPDATE = "Updating draft based on feedback..."
+_STATUS_EDIT = "Performing final edit..."
+_STATUS_JUDGE = "Judge evaluating drafts..."
+_STATUS_CONVERGED = "Council feedback converged, ending debate early..."
+# Preformatted round messages; later rounds fall back to an f-string
+_DEBATE_TEMPLATES = tuple(f"Council debate round {i}..." for i in range(1, 33))
+
+# Exact-input response cache shared across runs; entries expire after a week
+_RESPONSE_CACHE_DIR = ".echo_cache"
+_RESPONSE_CACHE_TTL = 7 * 24 * 60 * 60
+_RESPONSE_CACHE_SIZE = 256 * 2**20
+
+
+class FeedbackEntry(NamedTuple):
+    """One council member's feedback for a round."""
+    agent_id: str
+    feedback: str
+    summary: str = ""
+    token_usage: Optional[Dict[str, int]] = None
+
+
+def _append_rounds(history: List[List[FeedbackEntry]],
+                   new_rounds: List[List[FeedbackEntry]]) -> List[List[FeedbackEntry]]:
+    """Extend the feedback history in place rather than copying it every round."""
+    history.extend(new_rounds)
+    return history
+
+
+def _response_key(*parts: Any) -> str:
+    """Content-address a call by hashing its serialized inputs."""
+    return hashlib.blake2b(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS), digest_size=32).hexdigest()
+
+
+def _feedback_signature(round_feedback: List[FeedbackEntry]) -> str:
+    """Hash a round's feedback independent of the order members answered in."""
+    texts = sorted(fb.feedback[:512] for fb in round_feedback)
+    return hashlib.blake2b("\n".join(texts).encode(), digest_size=16).hexdigest()
+
+
+def _shingles(round_feedback: List[FeedbackEntry], size: int = 3) -> Set[str]:
+    """Return the word n-grams of a round's feedback, lowercased."""
+    shingles = set()
+    for fb in round_feedback:
+        words = fb.feedback.lower().split()
+        shingles.update(" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1)))
+    return shingles
+
+
+def _similarity(previous: List[FeedbackEntry], current: List[FeedbackEntry]) -> float:
+    """Jaccard similarity of two rounds' feedback shingles."""
+    a, b = _shingles(previous), _shingles(current)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass(slots=True)
+class CouncilState:
+    user_query: str = ""
+    current_draft: str = ""
+    initial_draft: str = ""
+    feedback_history: Annotated[List[List[FeedbackEntry]], _append_rounds] = field(default_factory=list)
+    latest_feedback: List[FeedbackEntry] = field(default_factory=list)
+    current_round: int = 0
+    max_rounds: int = 0
+    final_response: str = ""
+    ui_callback: Any = None
+    judge_commentary: str = ""
+    feedback_signature: Optional[str] = None
+    converged: bool = False
+
+
+def _bound_node(method_name: str):
+    """Wrap a CouncilWorkflow method as a node that runs on the invoking instance."""
+    async def node(state: CouncilState, config: RunnableConfig) -> Dict[str, Any]:
+        workflow = config["configurable"]["workflow"]
+        return await getattr(workflow, method_name)(state)
+    node.__name__ = method_name
+    return node
+
+
+def _route_debate(state: CouncilState, config: RunnableConfig) -> Literal["continue", "end"]:
+    """Route through the invoking instance's should_continue_debate."""
+    return config["configurable"]["workflow"].should_continue_debate(state)
 
 
 class CouncilWorkflow:
-    def __init__(self, config: CouncilConfig, ui_callback=None):
+    _compiled_graph = None
+    
+    def __init__(self, config: CouncilConfig, ui_callback=None, use_cache: bool = True):
         self.config = config
         self.ui_callback = ui_callback
+        self.use_cache = use_cache
+        self._response_cache = None
+        
+        self.cache = None
+        if config.semantic_cache:
+            # numpy and the embeddings client are only needed when caching is on
+            from semantic_cache import SemanticCache
+            self.cache = SemanticCache()
         
         # Initialize agents
         self.draft_agent = DraftAgent(
             model_name=config.draft_agent.model,
-            temperature=config.draft_agent.temperature
+            temperature=config.draft_agent.temperature,
+            cache=self.cache
         )
         
         self.council_members = [
@@ -35,11 +125,22 @@ class CouncilWorkflow:
                 member_id=i,
                 model_name=agent_config.model,
                 temperature=agent_config.temperature,
-                perspective=f"Council Member {i+1}"
+                perspective=f"Council Member {i+1}",
+                cache=self.cache
             )
             for i, agent_config in enumerate(config.council_members)
         ]
         
+        # Members sharing a model and temperature are dispatched as one batch.
+        # Cached members are looked up one by one, so each is its own group.
+        groups: Dict[tuple, List[CouncilMember]] = {}
+        for member, agent_config in zip(self.council_members, config.council_members):
+            key = (agent_config.model, agent_config.temperature) if self.cache is None else (member.agent_id,)
+            groups.setdefault(key, []).append(member)
+        self.council_groups = list(groups.values())
+        # Feedback is reported in member order however the groups finish
+        self._member_order = {member.agent_id: i for i, member in enumerate(self.council_members)}
+        
         self.editor_agent = EditorAgent(
             model_name=config.editor_agent.model,
             temperature=config.editor_agent.temperature
@@ -53,15 +154,27 @@ class CouncilWorkflow:
         # Build the workflow
         self.workflow = self._build_workflow()
     
-    def _build_workflow(self) -> StateGraph:
+    @classmethod
+    def _build_workflow(cls) -> "CompiledStateGraph":
+        """Return the compiled graph, building it on first use.
+        
+        The graph only wires nodes together; the workflow instance that runs
+        it arrives through the run config, so one compile serves every
+        CouncilWorkflow in the process.
+        """
+        if cls._compiled_graph is not None:
+            return cls._compiled_graph
+        
+        # LangGraph is slow to import, so only load it when a graph is needed
+        from langgraph.graph import StateGraph, END, START
+        
         workflow = StateGraph(CouncilState)
         
         # Add nodes
-        workflow.add_node("create_draft", self.create_initial_draft)
-        workflow.add_node("council_debate", self.council_debate)
-        workflow.add_node("update_draft", self.update_draft)
-        workflow.add_node("final_edit", self.final_edit)
-        workflow.add_node("judge", self.judge)
+        workflow.add_node("create_draft", _bound_node("create_initial_draft"))
+        workflow.add_node("council_debate", _bound_node("council_debate"))
+        workflow.add_node("update_draft", _bound_node("update_draft"))
+        workflow.add_node("final_edit", _bound_node("final_edit"))
         
         # Add edges
         workflow.add_edge(START, "create_draft")
@@ -70,7 +183,7 @@ class CouncilWorkflow:
         # Conditional edge for debate rounds
         workflow.add_conditional_edges(
             "council_debate",
-            self.should_continue_debate,
+            _route_debate,
             {
                 "continue": "update_draft",
                 "end": "final_edit"
@@ -78,56 +191,100 @@ class CouncilWorkflow:
         )
         
         workflow.add_edge("update_draft", "council_debate")
-        workflow.add_edge("final_edit", "judge")
-        workflow.add_edge("judge", END)
+        workflow.add_edge("final_edit", END)
         
-        return workflow.compile()
+        cls._compiled_graph = workflow.compile()
+        return cls._compiled_graph
     
     async def create_initial_draft(self, state: CouncilState) -> Dict[str, Any]:
         """Create the initial draft."""
         if self.ui_callback:
-            await self.ui_callback("status", "Creating initial draft...")
+            await self.ui_callback("status", _STATUS_DRAFT)
         
-        response = await self.draft_agent.create_initial_draft(state["user_query"])
+        response = await self.draft_agent.create_initial_draft(state.user_query)
         
         if self.ui_callback:
             await self.ui_callback("draft_created", response)
         
         return {
             "current_draft": response.content,
-            "drafts": [response.content],
+            "initial_draft": response.content,
             "current_round": 0
         }
     
     async def council_debate(self, state: CouncilState) -> Dict[str, Any]:
         """Council members provide feedback on the current draft."""
-        current_round = state["current_round"] + 1
+        current_round = state.current_round + 1
         
         if self.ui_callback:
-            await self.ui_callback("status", f"Council debate round {current_round}...")
-        
-        # Gather feedback from all council members concurrently
-        feedback_tasks = [
-            member.provide_feedback(
-                user_query=state["user_query"],
-                current_draft=state["current_draft"],
-                round_number=current_round
-            )
-            for member in self.council_members
-        ]
+            status = (_DEBATE_TEMPLATES[current_round - 1]
+                      if current_round <= len(_DEBATE_TEMPLATES)
+                      else f"Council debate round {current_round}...")
+            await self.ui_callback("status", status)
         
-        feedback_responses = await asyncio.gather(*feedback_tasks)
+        # Bound in-flight requests so large councils don't trip rate limits
+        semaphore = asyncio.Semaphore(min(len(self.council_groups), self.config.max_concurrency))
         
-        # Store feedback
-        round_feedback = [
-            {
-                "agent_id": response.agent_id,
-                "feedback": response.content,
-                "summary": response.metadata.get("summary", ""),
-                "token_usage": response.metadata.get("token_usage", {})
-            }
-            for response in feedback_responses
-        ]
+        async def group_feedback(group: List[CouncilMember]) -> List[tuple]:
+            # Failures come back as values so one group never cancels the others
+            try:
+                async with semaphore:
+                    responses = await CouncilMember.provide_feedback_batch(
+                        group,
+                        user_query=state.user_query,
+                        current_draft=state.current_draft,
+                        round_number=current_round
+                    )
+            except Exception as e:
+                responses = [e] * len(group)
+            return list(zip(group, responses))
+        
+        round_feedback = []
+        failures = []
+        
+        # Surface each group's feedback as soon as it lands instead of
+        # waiting for the slowest member. Plain tasks rather than a TaskGroup,
+        # so an error from the UI callback propagates unwrapped.
+        tasks = [asyncio.create_task(group_feedback(group)) for group in self.council_groups]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for member, response in await next_done:
+                    if isinstance(response, BaseException):
+                        failures.append(response)
+                        if self.ui_callback:
+                            await self.ui_callback("feedback_error", {
+                                "round": current_round,
+                                "agent_id": member.agent_id,
+                                "error": str(response) or type(response).__name__
+                            })
+                        continue
+                    
+                    feedback = FeedbackEntry(
+                        response.agent_id,
+                        response.content,
+                        response.metadata.get("summary", ""),
+                        response.metadata.get("token_usage")
+                    )
+                    round_feedback.append(feedback)
+                    
+                    if self.ui_callback:
+                        await self.ui_callback("feedback_item", {
+                            "round": current_round,
+                            "feedback": feedback
+                        })
+        finally:
+            # Don't leave requests running if the loop above was cut short
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # Restore member order: it numbers the feedback in update_draft and
+        # feeds the response cache key, so it must not depend on timing
+        round_feedback.sort(key=lambda fb: self._member_order[fb.agent_id])
+        
+        # Keep the round going with whichever members answered
+        if failures and not round_feedback:
+            raise failures[0]
         
         if self.ui_callback:
             await self.ui_callback("feedback_round", {
@@ -135,89 +292,127 @@ class CouncilWorkflow:
                 "feedback": round_feedback
             })
         
+        # Another round is unlikely to change much once the council repeats itself
+        signature = _feedback_signature(round_feedback)
+        converged = signature == state.feedback_signature
+        threshold = self.config.early_stop_threshold
+        if not converged and threshold > 0 and state.latest_feedback:
+            converged = _similarity(state.latest_feedback, round_feedback) >= threshold
+        
+        if converged and current_round < state.max_rounds and self.ui_callback:
+            await self.ui_callback("status", _STATUS_CONVERGED)
+        
         return {
             "current_round": current_round,
-            "feedback_history": [round_feedback]
+            "feedback_history": [round_feedback],
+            "latest_feedback": round_feedback,
+            "feedback_signature": signature,
+            "converged": converged
         }
     
     async def update_draft(self, state: CouncilState) -> Dict[str, Any]:
         """Update the draft based on council feedback."""
         if self.ui_callback:
-            await self.ui_callback("status", "Updating draft based on feedback...")
+            await self.ui_callback("status", _STATUS_UPDATE)
         
-        # Get the latest round of feedback
-        latest_feedback = state["feedback_history"][-1]
-        feedback_texts = [fb["feedback"] for fb in latest_feedback]
+        feedback_texts = [fb.feedback for fb in state.latest_feedback]
         
-        response = await self.draft_agent.update_draft(
-            current_draft=state["current_draft"],
-            feedback=feedback_texts
+        agent = self.draft_agent
+        response = await self._cached_call(
+            _response_key("update_draft", agent.llm.model_name, agent.llm.temperature,
+                          state.current_draft, feedback_texts),
+            lambda: agent.update_draft(
+                current_draft=state.current_draft,
+                feedback=feedback_texts
+            )
         )
         
         if self.ui_callback:
             await self.ui_callback("draft_updated", response)
         
         return {
-            "current_draft": response.content,
-            "drafts": [response.content]
+            "current_draft": response.content
         }
     
     async def final_edit(self, state: CouncilState) -> Dict[str, Any]:
-        """Final editing pass by the editor agent."""
+        """Final editing pass, then the judge's comparison of the result."""
         if self.ui_callback:
-            await self.ui_callback("status", "Performing final edit...")
+            await self.ui_callback("status", _STATUS_EDIT)
+        
+        async def forward_chunk(text: str) -> None:
+            await self.ui_callback("final_chunk", text)
         
-        response = await self.editor_agent.edit_final_response(
-            user_query=state["user_query"],
-            final_draft=state["current_draft"],
-            debate_history=state.get("feedback_history", [])
+        editor = self.editor_agent
+        response = await self._cached_call(
+            _response_key("final_edit", editor.llm.model_name, editor.llm.temperature,
+                          state.user_query, state.current_draft),
+            lambda: editor.edit_final_response(
+                user_query=state.user_query,
+                final_draft=state.current_draft,
+                debate_history=state.feedback_history,
+                on_chunk=forward_chunk if self.ui_callback else None
+            )
         )
         
         if self.ui_callback:
             await self.ui_callback("final_response", response)
-
-        return {"final_response": response.content, "current_draft": response.content}
-
-    async def judge(self, state: CouncilState) -> Dict[str, Any]:
-        """Judge compares the first draft with the final draft."""
-        if self.ui_callback:
-            await self.ui_callback("status", "Judge evaluating drafts...")
-
-        initial_draft = state["drafts"][0] if state.get("drafts") else state["current_draft"]
-        final_draft = state["final_response"]
-
-        response = await self.judge_agent.compare_drafts(
-            user_query=state["user_query"],
-            initial_draft=initial_draft,
-            final_draft=final_draft
+            await self.ui_callback("status", _STATUS_JUDGE)
+        
+        # The judge evaluates the edited text the user is shown, so it waits on the editor
+        judgement = await self.judge_agent.compare_drafts(
+            user_query=state.user_query,
+            initial_draft=state.initial_draft or state.current_draft,
+            final_draft=response.content
         )
-
+        
         if self.ui_callback:
-            await self.ui_callback("judge_commentary", response)
+            await self.ui_callback("judge_commentary", judgement)
 
-        return {"judge_commentary": response.content}
+        return {
+            "final_response": response.content,
+            "current_draft": response.content,
+            "judge_commentary": judgement.content
+        }
+    
+    async def _cached_call(self, key: str,
+                           call: Callable[[], Awaitable[AgentResponse]]) -> AgentResponse:
+        """Return the stored response for identical inputs, else make the call and store it."""
+        if not self.use_cache:
+            return await call()
+        
+        if self._response_cache is None:
+            # Opened on first use so runs with caching off never touch the disk
+            from diskcache import Cache
+            self._response_cache = Cache(_RESPONSE_CACHE_DIR, size_limit=_RESPONSE_CACHE_SIZE)
+        
+        hit = await asyncio.to_thread(self._response_cache.get, key)
+        if hit is not None:
+            return AgentResponse.from_cache(hit)
+        
+        response = await call()
+        await asyncio.to_thread(self._response_cache.set, key, asdict(response),
+                                expire=_RESPONSE_CACHE_TTL)
+        return response
     
     def should_continue_debate(self, state: CouncilState) -> Literal["continue", "end"]:
         """Determine whether to continue the debate or proceed to final edit."""
-        if state["current_round"] >= state["max_rounds"]:
+        if state.current_round >= state.max_rounds or state.converged:
             return "end"
         return "continue"
     
     async def run(self, user_query: str) -> Dict[str, str]:
         """Run the council workflow and return the final response and judgement."""
+        # Fields left out start from their CouncilState defaults
         initial_state = {
             "user_query": user_query,
-            "current_draft": "",
-            "drafts": [],
-            "feedback_history": [],
-            "current_round": 0,
             "max_rounds": self.config.debate_rounds,
-            "final_response": "",
-            "ui_callback": self.ui_callback,
-            "judge_commentary": ""
+            "ui_callback": self.ui_callback
         }
 
-        final_state = await self.workflow.ainvoke(initial_state)
+        final_state = await self.workflow.ainvoke(
+            initial_state,
+            config={"configurable": {"workflow": self}}
+        )
         return {
             "final_response": final_state["final_response"],
             "judge_commentary": final_state.get("judge_commentary", "")